@@ -1,9 +1,14 @@
 # app.py  — Minimal personal Overview page only
+import io
 import os
 import pandas as pd
 import streamlit as st
 from sqlalchemy import create_engine, text
 
+from queries import (FAN_LEAGUE_COUNTS_SQL, FAN_NAME_SQL, FAN_TEAM_RECORDS_SQL,
+                     FANS_SQL, fan_games_page_sql, fan_games_sql)
+from query_cache import RESULT_CACHE
+
 # -------------------- DB SETUP --------------------
 # Reads DATABASE_URL from .env if present
 DB_URL = os.getenv("DATABASE_URL")
@@ -20,30 +25,68 @@ if not DB_URL:
 engine = create_engine(DB_URL, pool_pre_ping=True)
 
 def q(sql, params=None):
-    """Safe query helper: returns DataFrame or empty DF on error."""
-    try:
+    """Safe query helper: returns DataFrame or empty DF on error.
+
+    Results are served from the result cache shared across sessions.
+    """
+    def load():
         with engine.begin() as conn:
             return pd.read_sql(text(sql), conn, params=params or {})
+    try:
+        return RESULT_CACHE.get_or_load(sql, params, load)
     except Exception as e:
         st.error(f"Query failed: {e}")
         return pd.DataFrame()
 
-def fan_games_one_row(fid: int) -> pd.DataFrame:
-    """All rows for a fan’s attended games (one row per game, not doubled)."""
-    return q("""
-        SELECT g.game_id, g.league, g.season, g.game_date,
-               gh.team_abbreviation AS home_team, gh.score AS home_score,
-               ga.team_abbreviation AS away_team, ga.score AS away_score,
-               CASE WHEN gh.is_winner THEN gh.team_abbreviation ELSE ga.team_abbreviation END AS winner
-        FROM attendance a
-        JOIN game g      ON g.game_id = a.game_id
-        JOIN game_team gh ON gh.game_id = g.game_id AND gh.home_away = 'HOME'
-        JOIN game_team ga ON ga.game_id = g.game_id AND ga.home_away = 'AWAY'
-        WHERE a.fan_id = :fid
-        GROUP BY g.game_id, g.league, g.season, g.game_date,
-                 gh.team_abbreviation, gh.score, ga.team_abbreviation, ga.score, gh.is_winner
-        ORDER BY g.game_date DESC;
-    """, {"fid": int(fid)})
+HISTORY_PAGE_SIZE = 20      # rows per keyset page of game history
+EXPORT_CHUNK_SIZE = 1000     # rows per server-side cursor fetch for exports
+
+def fan_games_page(fid: int, limit: int = HISTORY_PAGE_SIZE, after=None, team=None) -> pd.DataFrame:
+    """One page of a fan's attended games, newest first.
+
+    Pages are keyed on (game_date, game_id): pass the cursor of the previous
+    page's last row as `after` (None for the first page). `team` is an optional
+    (league, abbreviation) pair that narrows the page to that team's games.
+    """
+    params = {"fid": int(fid), "limit": int(limit)}
+    if after is not None:
+        params["after_date"], params["after_id"] = after[0], int(after[1])
+    if team is not None:
+        params["league"], params["abbr"] = team
+    sql = fan_games_page_sql(keyset=after is not None, team=team is not None)
+    return q(sql, params)
+
+def page_cursor(page: pd.DataFrame, limit: int = HISTORY_PAGE_SIZE):
+    """Keyset cursor for the page after `page`, or None when this was the last page."""
+    if len(page) < limit:
+        return None
+    last = page.iloc[-1]
+    return (last["game_date"], int(last["game_id"]))
+
+def fan_games_chunks(fid: int, chunksize: int = EXPORT_CHUNK_SIZE):
+    """Stream a fan's full history in DataFrame chunks via a server-side cursor.
+
+    Errors propagate so a failed export is never mistaken for a short one.
+    """
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        yield from pd.read_sql(text(fan_games_sql()), conn,
+                               params={"fid": int(fid)}, chunksize=chunksize)
+
+def fan_games_csv(fid: int) -> str:
+    """Full history as CSV, built chunk by chunk so no full DataFrame is held."""
+    buf = io.StringIO()
+    for i, chunk in enumerate(fan_games_chunks(fid)):
+        chunk.to_csv(buf, index=False, header=(i == 0))
+    return buf.getvalue()
+
+def fan_league_counts(fid: int) -> pd.DataFrame:
+    """Distinct games attended per league (sums to the fan's lifetime points)."""
+    return q(FAN_LEAGUE_COUNTS_SQL, {"fid": int(fid)})
+
+def fan_team_records(fid: int) -> pd.DataFrame:
+    """W/L/T per team across a fan's games, from each team's perspective."""
+    return q(FAN_TEAM_RECORDS_SQL, {"fid": int(fid)})
 
 # --- top nav links (shows as buttons/links at the top) ---
 nav = st.columns([1, 1, 8])
@@ -76,12 +119,7 @@ st.markdown("""
 
 # -------------------- SIDEBAR: PICK CURRENT FAN --------------------
 st.sidebar.header("Fan")
-_fans = q("""
-    SELECT fan_id, COALESCE(fan_name, CONCAT('Fan ', fan_id::text)) AS name
-    FROM fan
-    ORDER BY fan_id
-    LIMIT 5000;
-""")
+_fans = q(FANS_SQL)
 if _fans.empty:
     st.sidebar.warning("No fans found in database.")
     st.stop()
@@ -98,16 +136,22 @@ if "selected_fan_id" in st.session_state:
 fan_choice = st.sidebar.selectbox("Current fan", fan_labels, index=default_idx)
 selected_fan_id = int(fan_choice.split(" — ")[0])
 st.session_state["selected_fan_id"] = selected_fan_id
+# a prepared export belongs to the fan it was built for
+if st.session_state.get("history_csv", (selected_fan_id,))[0] != selected_fan_id:
+    del st.session_state["history_csv"]
+
+_cs = RESULT_CACHE.stats()
+st.sidebar.caption(f"Result cache: {_cs['hit_rate']:.0%} hit rate • {_cs['entries']} entries "
+                   f"• {_cs['bytes'] / 2**20:.1f} MB")
 
 # -------------------- OVERVIEW (personal) --------------------
 # 1) identity
-fan_row = q("SELECT COALESCE(fan_name, CONCAT('Fan ', fan_id::text)) AS name FROM fan WHERE fan_id=:fid",
-            {"fid": selected_fan_id})
+fan_row = q(FAN_NAME_SQL, {"fid": selected_fan_id})
 fan_name = fan_row.iloc[0]["name"] if not fan_row.empty else f"Fan {selected_fan_id}"
 
-# 2) lifetime games + simple points model
-fg = fan_games_one_row(selected_fan_id)
-points = int(fg["game_id"].nunique()) if not fg.empty else 0
+# 2) lifetime games + simple points model (aggregates only, no history pull)
+by_lg = fan_league_counts(selected_fan_id)
+points = int(by_lg["games"].sum()) if not by_lg.empty else 0
 
 thresholds = [5, 10, 20, 40]   # Bronze / Silver / Gold / Legend
 next_threshold = next((t for t in thresholds if points < t), thresholds[-1])
@@ -122,9 +166,8 @@ st.progress(progress)
 # lifetime metrics
 c1, c2 = st.columns(2)
 c1.metric("Lifetime games attended", points)
-by_lg = fg.groupby("league")["game_id"].nunique().reset_index() if not fg.empty else pd.DataFrame()
 if not by_lg.empty:
-    summary = " • ".join(f"{r.league}: {int(r.game_id)}" for _, r in by_lg.iterrows())
+    summary = " • ".join(f"{r.league}: {int(r.games)}" for _, r in by_lg.iterrows())
 else:
     summary = "—"
 c2.metric("By league", summary)
@@ -133,10 +176,10 @@ st.divider()
 
 # 4) previous 5 games as clickable chips (no W/L decorations by request)
 st.markdown("#### Previous games")
-if fg.empty:
+last5 = fan_games_page(selected_fan_id, limit=5) if points else pd.DataFrame()
+if last5.empty:
     st.info("No games yet for this fan.")
 else:
-    last5 = fg.head(5).copy()  # already sorted desc by date
     def chip_label(r):
         # ex: "2024-10-30: CHA vs ATL"
         d = pd.to_datetime(r["game_date"]).date()
@@ -148,9 +191,9 @@ else:
             st.session_state["open_game_id"] = int(row["game_id"])
 
     # If clicked, show details
-    if "open_game_id" in st.session_state:
-        gid = st.session_state["open_game_id"]
-        det = fg[fg["game_id"] == gid].iloc[0]
+    opened = last5[last5["game_id"] == st.session_state.get("open_game_id")]
+    if not opened.empty:
+        det = opened.iloc[0]
         st.markdown("##### Game details")
         st.write({
             "game_id": int(det["game_id"]),
@@ -161,72 +204,30 @@ else:
             "winner": det["winner"]
         })
 
+    # full export streams through a server-side cursor, only when asked for;
+    # the CSV lives in session state just until it is downloaded
+    if "history_csv" in st.session_state:
+        st.download_button("Download full history (CSV)", data=st.session_state["history_csv"][1],
+                           file_name=f"fan_{selected_fan_id}_games.csv", mime="text/csv",
+                           on_click=lambda: st.session_state.pop("history_csv", None))
+    elif st.button("Prepare full history export"):
+        try:
+            csv = fan_games_csv(selected_fan_id)
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+        else:
+            st.session_state["history_csv"] = (selected_fan_id, csv)
+            st.rerun()
+
 st.divider()
 
 # 5) Record by team (all leagues), with expand-to-view games
 st.markdown("#### Record by team")
 
-if fg.empty:
+agg = fan_team_records(selected_fan_id) if points else pd.DataFrame()
+if agg.empty:
     st.info("No games yet for this fan.")
 else:
-    # --- map abbrev -> full team name (City + Nickname) per league ---
-    tm = q("""
-        SELECT league, abbreviation, CONCAT(city, ' ', team_name) AS full_name
-        FROM team
-    """)
-    abbr_name = {(r["abbreviation"], r["league"]): r["full_name"] for _, r in tm.iterrows()}
-
-    def full_name(abbr, league):
-        return abbr_name.get((abbr, league), abbr)
-
-    # --- expand fan games to a row per team with W/L/T from that team's perspective ---
-    rows = []
-    for _, r in fg.iterrows():
-        league = r["league"]
-        # home perspective
-        if int(r["home_score"]) > int(r["away_score"]):
-            res_home, res_away = "W", "L"
-        elif int(r["home_score"]) < int(r["away_score"]):
-            res_home, res_away = "L", "W"
-        else:
-            res_home, res_away = "T", "T"
-
-        rows.append({
-            "game_id": int(r["game_id"]),
-            "league": league,
-            "game_date": r["game_date"],
-            "team": r["home_team"],
-            "opponent": r["away_team"],
-            "result": res_home,
-            "home_team": r["home_team"],
-            "away_team": r["away_team"],
-            "home_score": int(r["home_score"]),
-            "away_score": int(r["away_score"]),
-        })
-        # away perspective
-        rows.append({
-            "game_id": int(r["game_id"]),
-            "league": league,
-            "game_date": r["game_date"],
-            "team": r["away_team"],
-            "opponent": r["home_team"],
-            "result": res_away,
-            "home_team": r["home_team"],
-            "away_team": r["away_team"],
-            "home_score": int(r["home_score"]),
-            "away_score": int(r["away_score"]),
-        })
-
-    long_df = pd.DataFrame(rows)
-    long_df["team_name"] = long_df.apply(lambda x: full_name(x["team"], x["league"]), axis=1)
-
-    # --- aggregate to W/L/T per team ---
-    agg = (long_df.groupby(["league", "team", "team_name"], as_index=False)
-            .agg(games=("result", "count"),
-                 W=("result", lambda s: (s == "W").sum()),
-                 L=("result", lambda s: (s == "L").sum()),
-                 T=("result", lambda s: (s == "T").sum()))
-          )
     agg["win_pct"] = ((agg["W"] + 0.5 * agg["T"]) / agg["games"]).round(3)
     agg = agg.sort_values(["games", "win_pct"], ascending=[False, False])
 
@@ -236,22 +237,43 @@ else:
         "team_name": "team", "win_pct": "win_pct", "games": "games"
     }), use_container_width=True, height=320)
 
+    def team_result(r, team):
+        # W/L/T from `team`'s perspective
+        own, opp = ((r["home_score"], r["away_score"]) if r["home_team"] == team
+                    else (r["away_score"], r["home_score"]))
+        return "W" if own > opp else "L" if own < opp else "T"
+
     st.markdown("#### Expand a team to view lifetime games")
     for _, row in agg.iterrows():
         title = f"{row['team_name']} — {int(row['W'])}-{int(row['L'])}-{int(row['T'])}"
         with st.expander(title):
-            sub = long_df[(long_df["league"] == row["league"]) &
-                          (long_df["team"] == row["team"])].copy()
+            # expander bodies run even when collapsed, so only query once asked
+            team_key = f"team_{selected_fan_id}_{row['league']}_{row['team']}"
+            if not st.toggle("Show games", key=f"{team_key}_show"):
+                continue
+            # keyset-paged: each "Older games" click advances this team's cursor
+            cursor_key = f"{team_key}_cursor"
+            sub = fan_games_page(selected_fan_id, after=st.session_state.get(cursor_key),
+                                 team=(row["league"], row["team"]))
             if sub.empty:
                 st.info("No games for this team.")
             else:
                 sub["date"] = pd.to_datetime(sub["game_date"]).dt.date.astype(str)
                 sub["matchup"] = sub.apply(lambda x: f"{x['home_team']} vs {x['away_team']}", axis=1)
-                sub["score"] = sub.apply(lambda x: f"{x['home_score']}-{x['away_score']}", axis=1)
-                sub = sub[["date", "league", "matchup", "score", "result"]]
-                st.dataframe(sub.sort_values("date", ascending=False),
+                sub["score"] = sub.apply(lambda x: f"{int(x['home_score'])}-{int(x['away_score'])}", axis=1)
+                sub["result"] = sub.apply(lambda x: team_result(x, row["team"]), axis=1)
+                st.dataframe(sub[["date", "league", "matchup", "score", "result"]],
                              use_container_width=True, height=260)
 
+            nxt = page_cursor(sub)
+            b1, b2 = st.columns(2)
+            if cursor_key in st.session_state and b1.button("Newest games", key=f"{cursor_key}_reset"):
+                del st.session_state[cursor_key]
+                st.rerun()
+            if nxt is not None and b2.button("Older games", key=f"{cursor_key}_next"):
+                st.session_state[cursor_key] = nxt
+                st.rerun()
+
 
 # 6) offers — three static promo cards
 st.markdown("#### Offers")
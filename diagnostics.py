@@ -0,0 +1,286 @@
+# diagnostics.py — pre-rollout database check (replaces test_app.py)
+#
+#   python diagnostics.py                      # schema, sizes, indexes, page queries, pool
+#   python diagnostics.py --analyze --max-ms 250
+#
+# Exits non-zero when the schema is incomplete, a page query errors, or a query
+# is slower than --max-ms, so it can gate a deploy pipeline.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+from queries import (FAN_LEAGUE_COUNTS_SQL, FAN_NAME_SQL, FAN_TEAM_RECORDS_SQL, FANS_SQL,
+                     TEAM_LEADERBOARD_SQL, TEAMS_WITH_GAMES_SQL, fan_games_page_sql, fan_games_sql)
+
+# tables/columns the pages read
+EXPECTED_SCHEMA = {
+    "fan":        ["fan_id", "fan_name"],
+    "team":       ["league", "abbreviation", "city", "team_name"],
+    "game":       ["game_id", "league", "season", "game_date"],
+    "game_team":  ["game_id", "league", "team_abbreviation", "home_away", "score", "is_winner"],
+    "attendance": ["fan_id", "game_id"],
+}
+
+# leading index columns (any order) the page queries rely on
+EXPECTED_INDEXES = [
+    ("fan",        ["fan_id"]),
+    ("team",       ["league", "abbreviation"]),
+    ("game",       ["game_id"]),
+    ("game_team",  ["game_id"]),
+    ("game_team",  ["league", "team_abbreviation"]),
+    ("attendance", ["fan_id"]),
+    ("attendance", ["game_id"]),
+]
+
+
+def load_db_url():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+            url = os.getenv("DATABASE_URL")
+        except Exception:
+            pass
+    return url
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.1f} ms"
+
+
+class Report:
+    """Collects failures/warnings while printing the report as it goes."""
+
+    def __init__(self):
+        self.failures = []
+        self.warnings = []
+
+    def section(self, title):
+        print(f"\n== {title}")
+
+    def line(self, status, msg):
+        print(f"  [{status:4}] {msg}")
+        if status == "FAIL":
+            self.failures.append(msg)
+        elif status == "WARN":
+            self.warnings.append(msg)
+
+
+def check_schema(conn, report):
+    report.section("schema")
+    rows = conn.execute(text("""
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = ANY(:tables)
+    """), {"tables": list(EXPECTED_SCHEMA)}).all()
+    found = {}
+    for t, c in rows:
+        found.setdefault(t, set()).add(c)
+    for table, cols in EXPECTED_SCHEMA.items():
+        if table not in found:
+            report.line("FAIL", f"{table}: table missing")
+            continue
+        missing = [c for c in cols if c not in found[table]]
+        if missing:
+            report.line("FAIL", f"{table}: missing columns {', '.join(missing)}")
+        else:
+            report.line("ok", table)
+    return all(t in found for t in EXPECTED_SCHEMA)
+
+
+def check_sizes(conn, report, exact=False):
+    report.section("table sizes" + (" (exact counts)" if exact else " (planner estimates)"))
+    rows = conn.execute(text("""
+        SELECT c.relname, c.reltuples::bigint AS est_rows,
+               pg_total_relation_size(c.oid) AS total_bytes,
+               COALESCE(s.last_analyze, s.last_autoanalyze) AS analyzed
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relname = ANY(:tables)
+        ORDER BY c.relname
+    """), {"tables": list(EXPECTED_SCHEMA)}).all()
+    for name, est_rows, total_bytes, analyzed in rows:
+        n = conn.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar() if exact else est_rows
+        # PostgreSQL 14+ reports reltuples = -1 until the table is first analyzed
+        rows_txt = f"{n:>12,}" if n >= 0 else f"{'unknown':>12}"
+        msg = f"{name:<11} {rows_txt} rows  {total_bytes / 2**20:9.1f} MB"
+        if analyzed is None:
+            report.line("WARN", msg + "  (never analyzed: plans may be off)")
+        else:
+            report.line("ok", msg)
+
+
+def check_indexes(conn, report, strict=False):
+    report.section("index coverage")
+    rows = conn.execute(text("""
+        SELECT t.relname, i.relname,
+               array_agg(a.attname::text ORDER BY k.ord) AS cols
+        FROM pg_index x
+        JOIN pg_class t     ON t.oid = x.indrelid
+        JOIN pg_class i     ON i.oid = x.indexrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        CROSS JOIN LATERAL unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+        WHERE n.nspname = 'public' AND t.relname = ANY(:tables)
+        GROUP BY t.relname, i.relname
+    """), {"tables": list(EXPECTED_SCHEMA)}).all()
+    indexes = {}
+    for table, index, cols in rows:
+        indexes.setdefault(table, []).append((index, list(cols)))
+    for table, want in EXPECTED_INDEXES:
+        label = f"{table}({', '.join(want)})"
+        hit = next((name for name, cols in indexes.get(table, [])
+                    if set(cols[:len(want)]) == set(want)), None)
+        if hit:
+            report.line("ok", f"{label:<40} {hit}")
+        else:
+            report.line("FAIL" if strict else "WARN", f"{label:<40} no index with these leading columns")
+
+
+def pick_params(conn, page_size):
+    """Representative (worst-case) parameters: the heaviest fan and team."""
+    fid = conn.execute(text("""
+        SELECT fan_id FROM attendance GROUP BY fan_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)).scalar()
+    team = conn.execute(text("""
+        SELECT gt.league, gt.team_abbreviation
+        FROM attendance a JOIN game_team gt ON gt.game_id = a.game_id
+        GROUP BY gt.league, gt.team_abbreviation
+        ORDER BY COUNT(*) DESC LIMIT 1
+    """)).first()
+    after = None
+    if fid is not None:
+        after = conn.execute(text(fan_games_page_sql()), {"fid": fid, "limit": page_size}).all()
+        after = (after[-1].game_date, after[-1].game_id) if len(after) == page_size else None
+    return fid, (tuple(team) if team else None), after
+
+
+def page_queries(fid, team, after, page_size):
+    """(page, name, sql, params) for every query the pages issue."""
+    out = [("overview", "fans", FANS_SQL, {})]
+    if fid is not None:
+        base = {"fid": fid, "limit": page_size}
+        out += [
+            ("overview", "fan name", FAN_NAME_SQL, {"fid": fid}),
+            ("overview", "league counts", FAN_LEAGUE_COUNTS_SQL, {"fid": fid}),
+            ("overview", "team records", FAN_TEAM_RECORDS_SQL, {"fid": fid}),
+            ("overview", "history page 1", fan_games_page_sql(), base),
+        ]
+        if after is not None:
+            out.append(("overview", "history page 2", fan_games_page_sql(keyset=True),
+                        dict(base, after_date=after[0], after_id=after[1])))
+        if team is not None:
+            out.append(("overview", "team history page", fan_games_page_sql(team=True),
+                        dict(base, league=team[0], abbr=team[1])))
+        out.append(("overview", "full export", fan_games_sql(), {"fid": fid}))
+    out.append(("leaderboard", "teams with games", TEAMS_WITH_GAMES_SQL, {}))
+    if team is not None:
+        out.append(("leaderboard", "leaderboard", TEAM_LEADERBOARD_SQL,
+                    {"league": team[0], "abbr": team[1]}))
+    return out
+
+
+def plan_summary(conn, sql, params, analyze, verbose):
+    opts = "ANALYZE, BUFFERS" if analyze else "COSTS"
+    lines = [r[0] for r in conn.execute(text(f"EXPLAIN ({opts}) " + sql.strip().rstrip(";")), params)]
+    if verbose:
+        return lines
+    # root node plus any sequential scans, which is where cliffs usually hide
+    return [lines[0].strip()] + [l.strip() for l in lines[1:] if "Seq Scan" in l]
+
+
+def check_queries(engine, report, args):
+    limit = f", limit {args.max_ms:.0f} ms" if args.max_ms else ""
+    report.section(f"page queries (x{args.repeat}{limit})")
+    with engine.connect() as conn:
+        fid, team, after = pick_params(conn, args.page_size)
+        print(f"  params: fan_id={fid} team={team[0] + ':' + team[1] if team else None}")
+        for page, name, sql, params in page_queries(fid, team, after, args.page_size):
+            label = f"{page}/{name}"
+            try:
+                times, nrows = [], 0
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    nrows = len(conn.execute(text(sql), params).all())
+                    times.append(time.perf_counter() - t0)
+                med = statistics.median(times)
+                msg = f"{label:<34} {ms(med)} median {ms(max(times))} max {nrows:>7,} rows"
+                slow = args.max_ms and med * 1000 > args.max_ms
+                report.line("FAIL" if slow else "ok", msg)
+                if args.plans:
+                    for l in plan_summary(conn, sql, params, args.analyze, args.verbose):
+                        print(f"         {l}")
+            except Exception as e:
+                conn.rollback()
+                report.line("FAIL", f"{label}: {str(e).splitlines()[0]}")
+
+
+def check_pool(engine, report, repeat):
+    report.section("connection pool")
+    engine.dispose()
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    report.line("ok", f"{'cold connect + SELECT 1':<34} {ms(time.perf_counter() - t0)}")
+
+    checkouts, trips = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with engine.connect() as conn:
+            t1 = time.perf_counter()
+            conn.execute(text("SELECT 1"))
+            trips.append(time.perf_counter() - t1)
+        checkouts.append(t1 - t0)
+    report.line("ok", f"{'pooled checkout (pre-ping)':<34} {ms(statistics.median(checkouts))} median")
+    report.line("ok", f"{'round trip SELECT 1':<34} {ms(statistics.median(trips))} median")
+
+
+def positive_int(value):
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fantasy Fan database diagnostics")
+    ap.add_argument("--repeat", type=positive_int, default=3, help="timed runs per query (default 3)")
+    ap.add_argument("--page-size", type=positive_int, default=20, help="history page size to probe (default 20)")
+    ap.add_argument("--max-ms", type=float, default=0, help="fail when a query's median exceeds this")
+    ap.add_argument("--no-plans", dest="plans", action="store_false", help="skip EXPLAIN output")
+    ap.add_argument("--analyze", action="store_true", help="use EXPLAIN ANALYZE (runs each query again)")
+    ap.add_argument("--verbose", action="store_true", help="print full plans, not just root + seq scans")
+    ap.add_argument("--exact", action="store_true", help="COUNT(*) tables instead of planner estimates")
+    ap.add_argument("--strict", action="store_true", help="treat missing indexes as failures")
+    args = ap.parse_args(argv)
+
+    db_url = load_db_url()
+    if not db_url:
+        print("DATABASE_URL is not set (environment or .env)", file=sys.stderr)
+        return 2
+
+    engine = create_engine(db_url, pool_pre_ping=True)
+    report = Report()
+    try:
+        with engine.connect() as conn:
+            schema_ok = check_schema(conn, report)
+            check_sizes(conn, report, exact=args.exact)
+            check_indexes(conn, report, strict=args.strict)
+        if schema_ok:
+            check_queries(engine, report, args)
+        check_pool(engine, report, args.repeat)
+    except Exception as e:
+        report.line("FAIL", f"aborted: {str(e).splitlines()[0]}")
+
+    print(f"\n{len(report.failures)} failure(s), {len(report.warnings)} warning(s)")
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,9 @@ import pandas as pd
 import streamlit as st
 from sqlalchemy import create_engine, text
 
+from queries import TEAM_LEADERBOARD_SQL, TEAMS_WITH_GAMES_SQL
+from query_cache import RESULT_CACHE
+
 
 # ---- Persistent Header (replace your existing render_header with this) ----
 import os
@@ -107,9 +110,12 @@ if not DB_URL:
 engine = create_engine(DB_URL, pool_pre_ping=True)
 
 def q(sql, params=None):
-    try:
+    """Cached query helper (shared across sessions); empty DF on error."""
+    def load():
         with engine.begin() as conn:
             return pd.read_sql(text(sql), conn, params=params or {})
+    try:
+        return RESULT_CACHE.get_or_load(sql, params, load)
     except Exception as e:
         st.error(f"Query failed: {e}")
         return pd.DataFrame()
@@ -123,15 +129,8 @@ st.title("Team Leaderboard")
 st.caption("Lifetime — ranked by total games attended for the selected team")
 
 # --------- HELPERS ---------
-@st.cache_data(ttl=300)
 def teams_with_games():
-    return q("""
-        SELECT DISTINCT t.league, t.abbreviation, CONCAT(t.city, ' ', t.team_name) AS team_full
-        FROM team t
-        JOIN game_team gt ON gt.team_abbreviation = t.abbreviation AND gt.league = t.league
-        JOIN game g ON g.game_id = gt.game_id
-        ORDER BY t.league, t.abbreviation;
-    """)
+    return q(TEAMS_WITH_GAMES_SQL)
 
 # --------- UI: League & Team pickers ---------
 teams_df = teams_with_games()
@@ -152,48 +151,7 @@ with right:
 st.divider()
 
 # --------- QUERY: Lifetime leaderboard (top 25 by total games) ---------
-leaderboard = q("""
-    WITH fan_team_games AS (
-        SELECT
-            a.fan_id,
-            COALESCE(f.fan_name, CONCAT('Fan ', a.fan_id::text)) AS fan_name,
-            g.game_id,
-            g.game_date,
-            gh.score AS home_score,
-            ga.score AS away_score,
-            gt.is_winner::int AS win_flag
-        FROM attendance a
-        JOIN game g        ON g.game_id = a.game_id
-        JOIN game_team gt  ON gt.game_id = g.game_id                      -- selected team's side
-        JOIN game_team gh  ON gh.game_id = g.game_id AND gh.home_away='HOME'
-        JOIN game_team ga  ON ga.game_id = g.game_id AND ga.home_away='AWAY'
-        LEFT JOIN fan f    ON f.fan_id = a.fan_id
-        WHERE gt.league = :league
-          AND gt.team_abbreviation = :abbr
-    ),
-    agg AS (
-        SELECT
-            fan_id,
-            MAX(fan_name) AS fan_name,
-            COUNT(*)      AS games,
-            SUM(win_flag) AS W,
-            SUM(CASE WHEN home_score = away_score THEN 1 ELSE 0 END) AS T
-        FROM fan_team_games
-        GROUP BY fan_id
-    )
-    SELECT
-        fan_id,
-        fan_name,
-        games,
-        W,
-        (games - W - T) AS L,
-        CASE WHEN games = 0 THEN 0 ELSE ROUND((W + 0.5*T)::numeric / games * 100, 1) END AS win_pct_num,
-        TO_CHAR(CASE WHEN games = 0 THEN 0 ELSE ((W + 0.5*T)::numeric / games * 100) END, 'FM9990.0"%"') AS win_pct,
-        (SELECT MAX(game_date) FROM fan_team_games ftg WHERE ftg.fan_id = agg.fan_id) AS last_attended
-    FROM agg
-    ORDER BY games DESC, win_pct_num DESC
-    LIMIT 25;
-""", {"league": league_pick, "abbr": team_abbr})
+leaderboard = q(TEAM_LEADERBOARD_SQL, {"league": league_pick, "abbr": team_abbr})
 
 if leaderboard.empty:
     st.info("No fan attendance found for this team yet.")
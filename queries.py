@@ -0,0 +1,127 @@
+# queries.py — SQL shared by the pages and the diagnostics command
+# Parameters use SQLAlchemy text() binds (:name).
+
+FANS_SQL = """
+    SELECT fan_id, COALESCE(fan_name, CONCAT('Fan ', fan_id::text)) AS name
+    FROM fan
+    ORDER BY fan_id
+    LIMIT 5000;
+"""
+
+FAN_NAME_SQL = "SELECT COALESCE(fan_name, CONCAT('Fan ', fan_id::text)) AS name FROM fan WHERE fan_id=:fid"
+
+# one row per attended game (home/away side by side); attendance is probed with
+# EXISTS so duplicate check-ins never double a game
+FAN_GAMES_SQL = """
+    SELECT g.game_id, g.league, g.season, g.game_date,
+           gh.team_abbreviation AS home_team, gh.score AS home_score,
+           ga.team_abbreviation AS away_team, ga.score AS away_score,
+           CASE WHEN gh.is_winner THEN gh.team_abbreviation ELSE ga.team_abbreviation END AS winner
+    FROM game g
+    JOIN game_team gh ON gh.game_id = g.game_id AND gh.home_away = 'HOME'
+    JOIN game_team ga ON ga.game_id = g.game_id AND ga.home_away = 'AWAY'
+    {joins}
+    WHERE EXISTS (SELECT 1 FROM attendance a WHERE a.game_id = g.game_id AND a.fan_id = :fid)
+      {filters}
+    ORDER BY g.game_date DESC, g.game_id DESC
+"""
+
+def fan_games_sql(keyset: bool = False, team: bool = False) -> str:
+    """FAN_GAMES_SQL with the optional keyset / team filters filled in.
+
+    keyset binds :after_date and :after_id; team binds :league and :abbr and
+    joins game_team on them so the (league, team_abbreviation) index is usable.
+    """
+    joins = ("JOIN game_team gt ON gt.game_id = g.game_id"
+             " AND gt.league = :league AND gt.team_abbreviation = :abbr") if team else ""
+    filters = "AND (g.game_date, g.game_id) < (:after_date, :after_id)" if keyset else ""
+    return FAN_GAMES_SQL.format(joins=joins, filters=filters)
+
+def fan_games_page_sql(keyset: bool = False, team: bool = False) -> str:
+    """fan_games_sql() limited to one page (:limit rows)."""
+    return fan_games_sql(keyset, team) + "    LIMIT :limit;"
+
+# same game set as FAN_GAMES_SQL: only games with both a HOME and an AWAY row
+FAN_LEAGUE_COUNTS_SQL = """
+    SELECT g.league, COUNT(*) AS games
+    FROM (SELECT DISTINCT game_id FROM attendance WHERE fan_id = :fid) fg
+    JOIN game g ON g.game_id = fg.game_id
+    WHERE EXISTS (SELECT 1 FROM game_team gh WHERE gh.game_id = g.game_id AND gh.home_away = 'HOME')
+      AND EXISTS (SELECT 1 FROM game_team ga WHERE ga.game_id = g.game_id AND ga.home_away = 'AWAY')
+    GROUP BY g.league
+    ORDER BY g.league;
+"""
+
+FAN_TEAM_RECORDS_SQL = """
+    WITH fg AS (
+        SELECT DISTINCT game_id FROM attendance WHERE fan_id = :fid
+    ),
+    sides AS (
+        SELECT g.league, gt.team_abbreviation AS team, gt.score, opp.score AS opp_score
+        FROM fg
+        JOIN game g        ON g.game_id = fg.game_id
+        JOIN game_team gt  ON gt.game_id = g.game_id AND gt.home_away IN ('HOME', 'AWAY')
+        JOIN game_team opp ON opp.game_id = g.game_id AND opp.home_away IN ('HOME', 'AWAY')
+                          AND opp.home_away <> gt.home_away
+    )
+    SELECT s.league, s.team,
+           COALESCE(t.city || ' ' || t.team_name, s.team) AS team_name,
+           COUNT(*) AS games,
+           SUM(CASE WHEN s.score > s.opp_score THEN 1 ELSE 0 END) AS "W",
+           SUM(CASE WHEN s.score < s.opp_score THEN 1 ELSE 0 END) AS "L",
+           SUM(CASE WHEN s.score = s.opp_score THEN 1 ELSE 0 END) AS "T"
+    FROM sides s
+    LEFT JOIN team t ON t.abbreviation = s.team AND t.league = s.league
+    GROUP BY s.league, s.team, t.city, t.team_name;
+"""
+
+TEAMS_WITH_GAMES_SQL = """
+    SELECT DISTINCT t.league, t.abbreviation, CONCAT(t.city, ' ', t.team_name) AS team_full
+    FROM team t
+    JOIN game_team gt ON gt.team_abbreviation = t.abbreviation AND gt.league = t.league
+    JOIN game g ON g.game_id = gt.game_id
+    ORDER BY t.league, t.abbreviation;
+"""
+
+TEAM_LEADERBOARD_SQL = """
+    WITH fan_team_games AS (
+        SELECT
+            a.fan_id,
+            COALESCE(f.fan_name, CONCAT('Fan ', a.fan_id::text)) AS fan_name,
+            g.game_id,
+            g.game_date,
+            gh.score AS home_score,
+            ga.score AS away_score,
+            gt.is_winner::int AS win_flag
+        FROM attendance a
+        JOIN game g        ON g.game_id = a.game_id
+        JOIN game_team gt  ON gt.game_id = g.game_id                      -- selected team's side
+        JOIN game_team gh  ON gh.game_id = g.game_id AND gh.home_away='HOME'
+        JOIN game_team ga  ON ga.game_id = g.game_id AND ga.home_away='AWAY'
+        LEFT JOIN fan f    ON f.fan_id = a.fan_id
+        WHERE gt.league = :league
+          AND gt.team_abbreviation = :abbr
+    ),
+    agg AS (
+        SELECT
+            fan_id,
+            MAX(fan_name) AS fan_name,
+            COUNT(*)      AS games,
+            SUM(win_flag) AS W,
+            SUM(CASE WHEN home_score = away_score THEN 1 ELSE 0 END) AS T
+        FROM fan_team_games
+        GROUP BY fan_id
+    )
+    SELECT
+        fan_id,
+        fan_name,
+        games,
+        W,
+        (games - W - T) AS L,
+        CASE WHEN games = 0 THEN 0 ELSE ROUND((W + 0.5*T)::numeric / games * 100, 1) END AS win_pct_num,
+        TO_CHAR(CASE WHEN games = 0 THEN 0 ELSE ((W + 0.5*T)::numeric / games * 100) END, 'FM9990.0"%"') AS win_pct,
+        (SELECT MAX(game_date) FROM fan_team_games ftg WHERE ftg.fan_id = agg.fan_id) AS last_attended
+    FROM agg
+    ORDER BY games DESC, win_pct_num DESC
+    LIMIT 25;
+"""
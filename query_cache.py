@@ -0,0 +1,157 @@
+# query_cache.py — process-wide result cache shared by every Streamlit session
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # memory budget for cached results
+DEFAULT_TTL = 300                      # seconds; same as the old st.cache_data(ttl=300)
+DEFAULT_WAIT_TIMEOUT = 30              # seconds a coalesced caller waits on the leader
+
+
+def _nbytes(value) -> int:
+    """Approximate in-memory size of a cached result."""
+    if hasattr(value, "memory_usage"):   # DataFrame
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # callers add columns to what they get back; never hand out the shared frame
+    return value.copy() if hasattr(value, "copy") else value
+
+
+class _Flight:
+    """One in-progress load that concurrent misses on the same key wait on."""
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.ok = False      # set only once the loader returned a value
+        self.stale = False   # invalidated while loading: hand out, but don't store
+
+
+class QueryCache:
+    """Memory-bounded LRU cache of query results keyed by (sql, params).
+
+    Concurrent misses on the same key are single-flighted: one caller runs the
+    loader, the rest wait for its result. Entries may carry tags so a write
+    path can drop just the results it affects via invalidate(); until one
+    exists, entries age out after `ttl` seconds.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL,
+                 wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, nbytes, tags, expires_at)
+        self._inflight = {}             # key -> _Flight
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0,
+                       "wait_timeouts": 0}
+
+    @staticmethod
+    def make_key(sql, params=None):
+        return (" ".join(sql.split()), tuple(sorted((params or {}).items())))
+
+    def get_or_load(self, sql, params, loader, tags=()):
+        """Cached result for (sql, params), calling `loader()` once on a miss.
+
+        Loader exceptions propagate to every waiting caller and are not cached.
+        A waiter whose leader takes longer than `wait_timeout` runs `loader()`
+        itself (uncached) rather than hanging on a stuck query.
+        """
+        key = self.make_key(sql, params)
+        tags = frozenset(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return _copy(entry[0])
+            if entry is not None:
+                self._drop(key)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight(tags)
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._stats["wait_timeouts"] += 1
+                return loader()
+            if flight.error is not None:
+                raise flight.error
+            if not flight.ok:
+                # leader was interrupted (KeyboardInterrupt, script rerun, ...)
+                raise RuntimeError("cached query was interrupted before it finished")
+            return _copy(flight.value)
+
+        try:
+            flight.value = loader()
+            flight.ok = True
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.ok and not flight.stale:
+                    self._store(key, flight.value, tags)
+            flight.done.set()
+        return _copy(flight.value)
+
+    def invalidate(self, *tags):
+        """Drop every entry (and in-flight load) carrying any of `tags`."""
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e[2] & tags]:
+                self._drop(key)
+                self._stats["invalidations"] += 1
+            for flight in self._inflight.values():
+                if flight.tags & tags:
+                    flight.stale = True
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            for flight in self._inflight.values():
+                flight.stale = True
+
+    def stats(self) -> dict:
+        """Counters plus current size; hit_rate counts coalesced waits as hits."""
+        with self._lock:
+            s = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        lookups = s["hits"] + s["coalesced"] + s["misses"]
+        s["hit_rate"] = (s["hits"] + s["coalesced"]) / lookups if lookups else 0.0
+        return s
+
+    # -- internals (caller holds self._lock) --
+    def _store(self, key, value, tags):
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes, tags, time.monotonic() + self.ttl)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    def _drop(self, key):
+        _, nbytes, _, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+
+# one instance per server process: modules are imported once, so every session shares it
+RESULT_CACHE = QueryCache()
+
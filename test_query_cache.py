@@ -0,0 +1,175 @@
+import sys
+import threading
+import time
+
+import pytest
+
+import query_cache
+from query_cache import QueryCache
+
+BLOB = sys.getsizeof(b"x" * 100)   # size of each cached value in the eviction tests
+
+
+def _blob():
+    return b"x" * 100
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        time.sleep(0.001)
+
+
+def _blocked_leader(cache, key, release, tags=()):
+    """Start a thread whose load blocks until `release` is set; return (thread, results)."""
+    entered, results = threading.Event(), []
+
+    def loader():
+        entered.set()
+        release.wait(2)
+        return "leader"
+
+    t = threading.Thread(target=lambda: results.append(cache.get_or_load(key, None, loader, tags)))
+    t.start()
+    entered.wait(2)
+    return t, results
+
+
+def test_concurrent_misses_load_once():
+    cache, release, calls = QueryCache(), threading.Event(), []
+    leader, results = _blocked_leader(cache, "select 1", release)
+
+    def follower():
+        results.append(cache.get_or_load("select  1", None, lambda: calls.append(1) or "follower"))
+
+    threads = [threading.Thread(target=follower) for _ in range(7)]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: cache.stats()["coalesced"] == 7)
+    release.set()
+    for t in [leader] + threads:
+        t.join()
+
+    assert calls == []
+    assert results == ["leader"] * 8
+    assert cache.stats()["misses"] == 1
+    assert cache.get_or_load("select 1", None, lambda: "reload") == "leader"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(max_bytes=3 * BLOB)
+    for key in "abc":
+        cache.get_or_load(key, None, _blob)
+    cache.get_or_load("a", None, lambda: pytest.fail("a should be cached"))   # touch a
+    cache.get_or_load("d", None, _blob)                                       # evicts b
+
+    loaded = []
+    for key in "acd":
+        cache.get_or_load(key, None, lambda: loaded.append(key))
+    assert loaded == []
+    cache.get_or_load("b", None, lambda: loaded.append("b") or _blob())
+    assert loaded == ["b"]
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] <= 3 * BLOB
+
+
+def test_oversized_result_is_not_stored():
+    cache = QueryCache(max_bytes=BLOB - 1)
+    cache.get_or_load("a", None, _blob)
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache, calls = QueryCache(ttl=10), []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load("a", None, loader) == 1
+    now[0] += 9
+    assert cache.get_or_load("a", None, loader) == 1
+    now[0] += 2
+    assert cache.get_or_load("a", None, loader) == 2
+
+
+def test_invalidation_during_load_is_not_stored():
+    cache, release = QueryCache(), threading.Event()
+    leader, results = _blocked_leader(cache, "a", release, tags=["fan:1"])
+    cache.invalidate("fan:1")
+    release.set()
+    leader.join()
+
+    assert results == ["leader"]
+    assert cache.stats()["entries"] == 0
+    assert cache.get_or_load("a", None, lambda: "fresh") == "fresh"
+
+
+def test_invalidate_drops_only_matching_tags():
+    cache = QueryCache()
+    cache.get_or_load("a", None, lambda: 1, tags=["fan:1"])
+    cache.get_or_load("b", None, lambda: 2, tags=["fan:2"])
+    cache.invalidate("fan:1")
+    assert cache.get_or_load("a", None, lambda: "reloaded") == "reloaded"
+    assert cache.get_or_load("b", None, lambda: "reloaded") == 2
+
+
+def test_errors_reach_caller_and_are_not_cached():
+    cache = QueryCache()
+    with pytest.raises(ZeroDivisionError):
+        cache.get_or_load("a", None, lambda: 1 / 0)
+    assert cache.get_or_load("a", None, lambda: "ok") == "ok"
+
+
+class _Interrupt(BaseException):
+    pass
+
+
+def test_interrupted_load_is_not_cached():
+    cache, release = QueryCache(), threading.Event()
+    entered, errors = threading.Event(), []
+
+    def loader():
+        entered.set()
+        release.wait(2)
+        raise _Interrupt
+
+    def leader():
+        try:
+            cache.get_or_load("a", None, loader)
+        except _Interrupt:
+            pass
+
+    def follower():
+        try:
+            cache.get_or_load("a", None, lambda: "follower")
+        except RuntimeError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=leader)
+    t.start()
+    entered.wait(2)
+    f = threading.Thread(target=follower)
+    f.start()
+    _wait_for(lambda: cache.stats()["coalesced"] == 1)
+    release.set()
+    t.join()
+    f.join()
+
+    assert len(errors) == 1
+    assert cache.stats()["entries"] == 0
+    assert cache.get_or_load("a", None, lambda: "fresh") == "fresh"
+
+
+def test_waiter_falls_back_after_timeout():
+    cache, release = QueryCache(wait_timeout=0.05), threading.Event()
+    leader, _ = _blocked_leader(cache, "a", release)
+    try:
+        assert cache.get_or_load("a", None, lambda: "direct") == "direct"
+        assert cache.stats()["wait_timeouts"] == 1
+    finally:
+        release.set()
+        leader.join()